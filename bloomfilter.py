@@ -1,131 +1,241 @@
-########################################################
-#
-# Implementation of the probabilistic data structure Bloom Filter (BF).
-# We use k hash functions, where k depends on the size of the BF.
-#
-# Let U be the reference stream of elements. Let S ⊆ U be the set of "good" values in the stream.
-# Given an element x ∈ U, we want to quickly determine, with high probability (specified as input),
-# whether x ∈ S or x ∉ S.
-# Let n = len(U) and m = len(S).
-#
-# Assumptions:
-# - the elements of the stream are all strings
-# - m << n
-#
-# Input:
-# m: estimated value of len(S), i.e., the number of elements that will be inserted into the Bloom Filter
-# p: admissible false positive rate (Failure Probability Rate)
-#
-# Output:
-# A data structure that can be queried as follows: for each element, it quickly tells,
-# with high probability, whether the element belongs to S or not.
-#
-# In this implementation, the k hash values associated with each element are computed as follows:
-# we fix 2 hash values for each element, and from these two we derive the k hash values
-# to be inserted into the array.
-# This per-element complexity of O(2 * hash + k * additions) is significantly lower than O(k * hash),
-# and, as shown by Kirsch and Mitzenmacher [1], it does not change the false positive rate
-# of the Bloom Filter data structure.
-#
-########################################################
-
-
-
-from bitarray import bitarray
-import mmh3
-import math
-import random
-
-
-
-class Bfilter:
-    def __init__(self, m, p):
-        self.n = math.ceil(-m * math.log(p) / (math.log(2) ** 2))  # Length that the Bloom Filter must have to satisfy the input false positive rate p
-        self.array = bitarray(self.n)      # the actual Bloom Filter bit array
-        self.array.setall(0)   # bit array initialization
-        self.k = math.floor(self.n/m * math.log(2))   # number of hash functions used per inserted element
-        if (self.k == 0):
-            self.k = 1
-    
-    def insert(self, element):
-        h1 = mmh3.hash(element, 1)
-        h2 = mmh3.hash(element, 2)
-        for i in range(self.k):
-            self.array[(h1 + i * h2) % self.n] = 1  # Recommended formula to obtain k independent hash functions [1]
-
-    # If even a single hash function returns "no", then the answer is "no".
-    # Otherwise, the answer is "yes".
-    def membership(self, element):
-        for i in range(self.k):
-            h1 = mmh3.hash(element, 1)
-            h2 = mmh3.hash(element, 2)
-            if (self.array[(h1 + i * h2) % self.n] == 0):
-                return False
-        return True
-
-
-
-
-# Input stream (lorem ipsum...)
-
-U = ['ferri', 'deorsum', 'suo', 'pondere', 'ad', 'lineam', 'hunc', 'naturalem', 'esse', 'omnium',
-              'corporum', 'motum', 'Deinde', 'ibidem', 'homo', 'acutus', 'cum', 'illud', 'ocurreret', 'si',
-              'omnia', 'deorsus', 'e', 'regione', 'ferrentur', 'et', 'ut', 'dixi', 'ad', 'lineam', 'numquam',
-              'fore', 'ut', 'atomus', 'altera', 'alteram', 'posset', 'attingere', 'itaque', 'attulit', 'rem',
-              'commenticiam', 'declinare', 'dixit', 'atomum', 'perpaulum', 'quo', 'nihil', 'posset', 'fieri',
-              'minus', 'ita', 'effici', 'complexiones', 'et', 'copulationes', 'et', 'adhaesiones', 'atomorum',
-              'inter', 'se', 'ex', 'quo', 'efficeretur', 'mundus', 'omnesque', 'partes', 'mundi', 'quaeque',
-              'in', 'eo', 'essent', 'Quae', 'cum', 'tota', 'res', 'est', 'ficta', 'pueriliter', 'tum', 'ne',
-              'efficit', 'quidem', 'quod', 'vult', 'nam', 'et', 'ipsa', 'declinatio', 'ad', 'libidinem', 'fingitur',
-              'ait', 'enim', 'declinare', 'atomum', 'sine', 'causa', 'quo', 'nihil', 'turpius', 'physico', 'quam',
-              'fieri', 'quicquam', 'sine', 'causa', 'dicere', 'et', 'illum', 'motum', 'naturalem', 'omnium',
-              'ponderum', 'ut', 'ipse', 'constituit', 'e', 'regione', 'inferiorem', 'locum', 'petentium', 'sine',
-              'causa', 'eripuit', 'atomis', 'nec', 'tamen', 'id', 'cuius', 'causa', 'haec', 'finxerat', 'assecutus',
-              'est', 'Nam', 'si', 'omnes', 'atomi', 'declinabunt', 'nullae', 'umquam', 'cohaerescent', 'sive', 'aliae',
-              'declinabunt', 'aliae', 'suo', 'nutu', 'recte', 'ferentur', 'primum', 'erit', 'hoc', 'quasi', 'provincias',
-              'atomis', 'dare', 'quae', 'recte', 'quae', 'oblique', 'ferantur', 'deinde', 'eadem', 'illa', 'atomorum', 'in',
-              'quo', 'etiam', 'Democritus', 'haeret', 'turbulenta', 'concursio', 'hunc', 'mundi', 'ornatum', 'efficere',
-              'non', 'poterit', 'ne', 'illud', 'quidem', 'physici', 'credere', 'aliquid', 'esse', 'minimum', 'quod',
-              'profecto', 'numquam', 'putavisset', 'si', 'a', 'Polyaeno', 'familiari', 'suo', 'geometrica', 'discere',
-              'maluisset', 'quam', 'illum', 'etiam', 'ipsum', 'dedocere', 'Sol', 'Democrito', 'magnus', 'videtur',
-              'quippe', 'homini', 'erudito', 'in', 'geometriaque', 'perfecto', 'huic', 'pedalis', 'fortasse', 'tantum',
-              'enim', 'esse', 'censet', 'quantus', 'videtur', 'vel', 'paulo', 'aut', 'maiorem', 'aut', 'minorem', 'Ita',
-              'quae', 'mutat', 'ea', 'corrumpit', 'quae', 'sequitur', 'sunt', 'tota', 'Democriti', 'atomi', 'inane',
-              'imagines', 'quae', 'eidola', 'nominant', 'quorum', 'incursione', 'non', 'solum', 'videamus', 'sed',
-              'etiam', 'cogitemus', 'infinitio', 'ipsa', 'quam', 'apeirian', 'vocant', 'tota', 'ab', 'illo', 'est',
-              'tum', 'innumerabiles', 'mundi', 'qui', 'et', 'oriantur', 'et', 'intereant', 'cotidie', 'Quae', 'etsi',
-              'mihi', 'nullo', 'modo', 'probantur', 'tamen', 'Democritum', 'laudatum', 'a', 'ceteris', 'ab', 'hoc',
-              'qui', 'eum', 'unum', 'secutus', 'esset', 'nollem', 'vituperatum']
-
-
-
-bf = Bfilter(100, 0.01)
-
-print(f"Empty Bloom Filter: {bf.array}")
-
-for i in range(100):
-    bf.insert(U[i])
-
-
-print(f"Bloom Filter after inserting m elements: {bf.array}")
-
-"""
-# Sanity check:
-for x in U[:100]:
-    print(bf.membership(x))
-"""
-
-
-sample = random.sample(range(50,200), 10)
-
-for i in range(10):
-    print(
-        f"The element {U[sample[i]]} is probably in S"
-        if bf.membership(U[sample[i]])
-        else f"The element {U[sample[i]]} is certainly not in S"
-    )
-
-
-# [1] Adam Kirsch and Michael Mitzenmacher,
-#     Less Hashing, Same Performance: Building a Better Bloom Filter,
-#     LNCS 4168, pp. 456–467, 2006
+########################################################
+#
+# Implementation of the probabilistic data structure Bloom Filter (BF).
+# We use k hash functions, where k depends on the size of the BF.
+#
+# Let U be the reference stream of elements. Let S ⊆ U be the set of "good" values in the stream.
+# Given an element x ∈ U, we want to quickly determine, with high probability (specified as input),
+# whether x ∈ S or x ∉ S.
+# Let n = len(U) and m = len(S).
+#
+# Assumptions:
+# - the elements of the stream are all strings
+# - m << n
+#
+# Input:
+# m: estimated value of len(S), i.e., the number of elements that will be inserted into the Bloom Filter
+# p: admissible false positive rate (Failure Probability Rate)
+#
+# Output:
+# A data structure that can be queried as follows: for each element, it quickly tells,
+# with high probability, whether the element belongs to S or not.
+#
+# In this implementation, the k hash values associated with each element are computed as follows:
+# we fix 2 hash values for each element, and from these two we derive the k hash values
+# to be inserted into the array.
+# This per-element complexity of O(2 * hash + k * additions) is significantly lower than O(k * hash),
+# and, as shown by Kirsch and Mitzenmacher [1], it does not change the false positive rate
+# of the Bloom Filter data structure.
+#
+########################################################
+
+
+
+import mmh3
+import math
+import numpy as np
+import random
+from functools import lru_cache
+from llvmlite import ir
+from numba import njit, types
+from numba.extending import intrinsic
+
+
+
+# Software prefetch, lowering to llvm.prefetch on arr[idx]. The k probed bytes
+# of a large filter are pseudo-random, so each one is a likely cache miss; by
+# prefetching the next iteration's byte before touching the current one the k
+# independent loads overlap instead of serializing.
+
+def _make_prefetch(rw):
+    @intrinsic
+    def _prefetch(typingctx, arr, idx):
+        sig = types.void(arr, types.int64)
+
+        def codegen(context, builder, signature, args):
+            ary = context.make_array(signature.args[0])(context, builder, args[0])
+            ptr = builder.gep(ary.data, [args[1]])
+            i8p = ir.IntType(8).as_pointer()
+            i32 = ir.IntType(32)
+            fnty = ir.FunctionType(ir.VoidType(), [i8p, i32, i32, i32])
+            try:
+                fn = builder.module.globals['llvm.prefetch.p0']
+            except KeyError:
+                fn = ir.Function(builder.module, fnty, 'llvm.prefetch.p0')
+            builder.call(fn, [builder.bitcast(ptr, i8p),
+                              ir.Constant(i32, rw),   # 0 = read, 1 = write
+                              ir.Constant(i32, 3),    # high temporal locality
+                              ir.Constant(i32, 1)])   # data cache
+            return context.get_dummy_value()
+
+        return sig, codegen
+
+    return _prefetch
+
+
+_prefetch_read = _make_prefetch(0)
+_prefetch_write = _make_prefetch(1)
+
+
+
+# JIT-compiled kernels for the k-hash inner loops: LLVM turns these into tight
+# native loops, removing the per-bit interpreter overhead entirely.
+#
+# The kernels are specialized per (k, mask) pair: both values are closure
+# constants rather than runtime arguments, so LLVM folds the mask and can
+# fully unroll the k-iteration loop (k is typically below 10). Filters with
+# the same parameters share one compiled kernel set through the cache.
+
+@lru_cache(maxsize=None)
+def _specialized_kernels(k, mask):
+
+    @njit(nogil=True)
+    def insert(arr, h1, h2):
+        for i in range(k):
+            idx = (h1 + i * h2) & mask  # Recommended formula to obtain k independent hash functions [1]
+            nxt = (idx + h2) & mask     # the word the next iteration will touch
+            _prefetch_write(arr, nxt >> 6)
+            arr[idx >> 6] |= np.uint64(1) << np.uint64(idx & 63)   # bit idx lives in 64-bit word idx/64
+
+    @njit(nogil=True)
+    def membership(arr, h1, h2):
+        for i in range(k):
+            idx = (h1 + i * h2) & mask
+            nxt = (idx + h2) & mask
+            _prefetch_read(arr, nxt >> 6)
+            if (arr[idx >> 6] >> np.uint64(idx & 63)) & np.uint64(1) == 0:
+                return False
+        return True
+
+    @njit(nogil=True)
+    def insert_batch(arr, hashes):
+        # hashes is an (N, 2) array of precomputed (h1, h2) pairs, one row per element
+        for e in range(hashes.shape[0]):
+            insert(arr, hashes[e, 0], hashes[e, 1])
+
+    return insert, membership, insert_batch
+
+
+def _as_bytes(element):
+    # elements are expected to be strings; anything else is coerced here, once
+    # per call, never inside a hash loop
+    if isinstance(element, str):
+        return element.encode('utf-8')
+    if isinstance(element, bytes):
+        return element
+    return str(element).encode('utf-8')
+
+
+def _hash_pair(b):
+    d = mmh3.mmh3_x64_128_digest(b)
+    return (int.from_bytes(d[:8], 'little', signed=True),
+            int.from_bytes(d[8:], 'little', signed=True))
+
+
+
+class Bfilter:
+    def __init__(self, m, p):
+        n_min = math.ceil(-m * math.log(p) / (math.log(2) ** 2))  # Length that the Bloom Filter must have to satisfy the input false positive rate p
+        self.n = max(1 << (n_min - 1).bit_length(), 64)   # rounded up to a power of two (at least one word), so the index modulo becomes a bitmask
+        self.mask = self.n - 1
+        self.array = np.zeros(self.n // 64, dtype=np.uint64)   # the actual Bloom Filter bit array, packed 64 slots per word
+        self.k = math.floor(self.n/m * math.log(2))   # number of hash functions used per inserted element
+        if (self.k == 0):
+            self.k = 1
+
+        # kernels compiled for this filter's exact k and mask
+        self._insert, self._membership, self._insert_batch = _specialized_kernels(self.k, self.mask)
+
+    def insert(self, element):
+        b = _as_bytes(element)   # encode once, mmh3 would re-encode on every call
+        h1, h2 = _hash_pair(b)   # one 128-bit MurmurHash3 run yields both 64-bit hashes
+        self._insert(self.array, h1, h2)
+
+    # Insert a whole stream at once: the (N, 2) array of hash pairs is computed
+    # upfront (see hash_stream), so the k-hash loops over all N elements run in
+    # a single JIT call with no per-element Python overhead.
+    def insert_batch(self, hashes):
+        self._insert_batch(self.array, hashes)
+
+    # If even a single hash function returns "no", then the answer is "no".
+    # Otherwise, the answer is "yes".
+    def membership(self, element):
+        b = _as_bytes(element)
+        h1, h2 = _hash_pair(b)
+        return self._membership(self.array, h1, h2)
+
+
+# Precompute the hash pairs of a whole stream in one pass, ready for insert_batch.
+def hash_stream(stream):
+    H = np.empty((len(stream), 2), dtype=np.int64)
+    for i, element in enumerate(stream):
+        b = _as_bytes(element)
+        H[i, 0], H[i, 1] = _hash_pair(b)
+    return H
+
+
+
+
+# Input stream (lorem ipsum...)
+
+U = ['ferri', 'deorsum', 'suo', 'pondere', 'ad', 'lineam', 'hunc', 'naturalem', 'esse', 'omnium',
+              'corporum', 'motum', 'Deinde', 'ibidem', 'homo', 'acutus', 'cum', 'illud', 'ocurreret', 'si',
+              'omnia', 'deorsus', 'e', 'regione', 'ferrentur', 'et', 'ut', 'dixi', 'ad', 'lineam', 'numquam',
+              'fore', 'ut', 'atomus', 'altera', 'alteram', 'posset', 'attingere', 'itaque', 'attulit', 'rem',
+              'commenticiam', 'declinare', 'dixit', 'atomum', 'perpaulum', 'quo', 'nihil', 'posset', 'fieri',
+              'minus', 'ita', 'effici', 'complexiones', 'et', 'copulationes', 'et', 'adhaesiones', 'atomorum',
+              'inter', 'se', 'ex', 'quo', 'efficeretur', 'mundus', 'omnesque', 'partes', 'mundi', 'quaeque',
+              'in', 'eo', 'essent', 'Quae', 'cum', 'tota', 'res', 'est', 'ficta', 'pueriliter', 'tum', 'ne',
+              'efficit', 'quidem', 'quod', 'vult', 'nam', 'et', 'ipsa', 'declinatio', 'ad', 'libidinem', 'fingitur',
+              'ait', 'enim', 'declinare', 'atomum', 'sine', 'causa', 'quo', 'nihil', 'turpius', 'physico', 'quam',
+              'fieri', 'quicquam', 'sine', 'causa', 'dicere', 'et', 'illum', 'motum', 'naturalem', 'omnium',
+              'ponderum', 'ut', 'ipse', 'constituit', 'e', 'regione', 'inferiorem', 'locum', 'petentium', 'sine',
+              'causa', 'eripuit', 'atomis', 'nec', 'tamen', 'id', 'cuius', 'causa', 'haec', 'finxerat', 'assecutus',
+              'est', 'Nam', 'si', 'omnes', 'atomi', 'declinabunt', 'nullae', 'umquam', 'cohaerescent', 'sive', 'aliae',
+              'declinabunt', 'aliae', 'suo', 'nutu', 'recte', 'ferentur', 'primum', 'erit', 'hoc', 'quasi', 'provincias',
+              'atomis', 'dare', 'quae', 'recte', 'quae', 'oblique', 'ferantur', 'deinde', 'eadem', 'illa', 'atomorum', 'in',
+              'quo', 'etiam', 'Democritus', 'haeret', 'turbulenta', 'concursio', 'hunc', 'mundi', 'ornatum', 'efficere',
+              'non', 'poterit', 'ne', 'illud', 'quidem', 'physici', 'credere', 'aliquid', 'esse', 'minimum', 'quod',
+              'profecto', 'numquam', 'putavisset', 'si', 'a', 'Polyaeno', 'familiari', 'suo', 'geometrica', 'discere',
+              'maluisset', 'quam', 'illum', 'etiam', 'ipsum', 'dedocere', 'Sol', 'Democrito', 'magnus', 'videtur',
+              'quippe', 'homini', 'erudito', 'in', 'geometriaque', 'perfecto', 'huic', 'pedalis', 'fortasse', 'tantum',
+              'enim', 'esse', 'censet', 'quantus', 'videtur', 'vel', 'paulo', 'aut', 'maiorem', 'aut', 'minorem', 'Ita',
+              'quae', 'mutat', 'ea', 'corrumpit', 'quae', 'sequitur', 'sunt', 'tota', 'Democriti', 'atomi', 'inane',
+              'imagines', 'quae', 'eidola', 'nominant', 'quorum', 'incursione', 'non', 'solum', 'videamus', 'sed',
+              'etiam', 'cogitemus', 'infinitio', 'ipsa', 'quam', 'apeirian', 'vocant', 'tota', 'ab', 'illo', 'est',
+              'tum', 'innumerabiles', 'mundi', 'qui', 'et', 'oriantur', 'et', 'intereant', 'cotidie', 'Quae', 'etsi',
+              'mihi', 'nullo', 'modo', 'probantur', 'tamen', 'Democritum', 'laudatum', 'a', 'ceteris', 'ab', 'hoc',
+              'qui', 'eum', 'unum', 'secutus', 'esset', 'nollem', 'vituperatum']
+
+
+
+bf = Bfilter(100, 0.01)
+
+print(f"Empty Bloom Filter: {bf.array}")
+
+bf.insert_batch(hash_stream(U[:100]))
+
+
+print(f"Bloom Filter after inserting m elements: {bf.array}")
+
+"""
+# Sanity check:
+for x in U[:100]:
+    print(bf.membership(x))
+"""
+
+
+sample = random.sample(range(50,200), 10)
+
+membership = bf.membership   # bind once, skip the attribute lookup per query
+for x in (U[j] for j in sample):
+    print(
+        f"The element {x} is probably in S"
+        if membership(x)
+        else f"The element {x} is certainly not in S"
+    )
+
+
+# [1] Adam Kirsch and Michael Mitzenmacher,
+#     Less Hashing, Same Performance: Building a Better Bloom Filter,
+#     LNCS 4168, pp. 456–467, 2006
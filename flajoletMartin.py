@@ -1,197 +1,386 @@
-########################################################
-#
-# Implementation of the Flajolet–Martin probabilistic counter in its general form.
-#
-# Let U be the reference stream of elements. At each time step, we want to estimate how many distinct
-# elements have appeared in the stream so far.
-#
-# The Flajolet–Martin algorithm provides a good approximation of this value without maintaining the full set of distinct
-# elements (which could be too large to store in memory).
-#
-# Assumption:
-# - the stream contains at most 2^64 distinct elements
-#
-# Input:
-# s, t: number of hash functions used to improve the approximation
-#
-# Output:
-# an approximation of the number of distinct elements seen so far in the stream, with high probability
-#
-# For better accuracy and lower variance, improved versions of Flajolet–Martin should be used, such as LogLog or HyperLogLog.
-#
-########################################################
-
-
-import math
-import mmh3
-import numpy as np
-import random
-
-
-
-class FM_1:
-    """
-    Basic Flajolet-Martin sketch using a single hash function.
-    """
-
-    def __init__(self):
-        self.mask = (1 << 64) - 1     # use only the last 64 bits of the hash
-        self.R = 0                  # maximum number of trailing zeros observed
-    
-    def insert(self, element):
-        seed = 0
-        for char in element:
-            seed += ord(char)
-
-        val = mmh3.hash128(str(element), seed=seed, signed=False) & self.mask   # random 128-bit sequence, masked to 64 bits
-
-        # count trailing zeros
-        if val == 0:
-            zeros = 64
-        else:
-            zeros = (val & -val).bit_length() - 1
-
-        self.R = max(self.R, zeros)
-
-    def query(self):
-        # the FM estimate: a power of 2, unbiased after applying the correction factor
-        return math.floor((2**self.R)/0.77351)
-
-
-class FM_st:
-    """
-    Flajolet-Martin sketch with multiple hash functions and statistical aggregation.
-    """
-
-    def __init__(self, s, t):
-        self.mask = (1 << 64) - 1    # assume |U| <= 2^64
-        self.s = s
-        self.t = t
-
-        # We use s * t different hash functions.
-        # For each of them, we run the FM algorithm and store the estimate.
-        # The results are stored in a matrix of size t x s.
-        #
-        # Aggregation strategy:
-        # - compute the mean for each row
-        # - take the median of the means (median-of-means)
-        #
-        # Alternative:
-        # - compute the median for each row
-        # - take the mean of the medians (mean-of-medians)
-
-        self.R_TABLE = np.zeros((self.t, self.s), dtype=int)
-
-    def insert(self, element):
-
-        seed = 0
-        for i in range(self.t):
-            for j in range(self.s):
-                
-                val = mmh3.hash128(str(element), seed, signed=False) & self.mask   # random 64-bit sequence
-                
-                if (val == 0):
-                    zeros = 64
-                else:
-                    zeros = (val & -val).bit_length() - 1
-                
-                self.R_TABLE[i, j] = max(self.R_TABLE[i, j], zeros)
-
-                seed = seed + 1 # Ensure a unique hash function per (i, j)
-
-    
-    def query_median_of_means(self):
-
-        mean_array = np.mean((2.0 ** self.R_TABLE), axis=1)
-        return math.floor(np.median((mean_array)))    # (mean_array)/0.77351
-    
-    def query_mean_of_medians(self):
-
-        median_array = np.median((2.0 ** self.R_TABLE), axis=1)
-        return math.floor(np.mean(median_array))
-
-
-# Stream in input (lorem ipsum...)
-
-U = ['ferri', 'deorsum', 'suo', 'pondere', 'ad', 'lineam', 'hunc', 'naturalem', 'esse', 'omnium',
-              'corporum', 'motum', 'Deinde', 'ibidem', 'homo', 'acutus', 'cum', 'illud', 'ocurreret', 'si',
-              'omnia', 'deorsus', 'e', 'regione', 'ferrentur', 'et', 'ut', 'dixi', 'ad', 'lineam', 'numquam',
-              'fore', 'ut', 'atomus', 'altera', 'alteram', 'posset', 'attingere', 'itaque', 'attulit', 'rem',
-              'commenticiam', 'declinare', 'dixit', 'atomum', 'perpaulum', 'quo', 'nihil', 'posset', 'fieri',
-              'minus', 'ita', 'effici', 'complexiones', 'et', 'copulationes', 'et', 'adhaesiones', 'atomorum',
-              'inter', 'se', 'ex', 'quo', 'efficeretur', 'mundus', 'omnesque', 'partes', 'mundi', 'quaeque',
-              'in', 'eo', 'essent', 'Quae', 'cum', 'tota', 'res', 'est', 'ficta', 'pueriliter', 'tum', 'ne',
-              'efficit', 'quidem', 'quod', 'vult', 'nam', 'et', 'ipsa', 'declinatio', 'ad', 'libidinem', 'fingitur',
-              'ait', 'enim', 'declinare', 'atomum', 'sine', 'causa', 'quo', 'nihil', 'turpius', 'physico', 'quam',
-              'fieri', 'quicquam', 'sine', 'causa', 'dicere', 'et', 'illum', 'motum', 'naturalem', 'omnium',
-              'ponderum', 'ut', 'ipse', 'constituit', 'e', 'regione', 'inferiorem', 'locum', 'petentium', 'sine',
-              'causa', 'eripuit', 'atomis', 'nec', 'tamen', 'id', 'cuius', 'causa', 'haec', 'finxerat', 'assecutus',
-              'est', 'Nam', 'si', 'omnes', 'atomi', 'declinabunt', 'nullae', 'umquam', 'cohaerescent', 'sive', 'aliae',
-              'declinabunt', 'aliae', 'suo', 'nutu', 'recte', 'ferentur', 'primum', 'erit', 'hoc', 'quasi', 'provincias',
-              'atomis', 'dare', 'quae', 'recte', 'quae', 'oblique', 'ferantur', 'deinde', 'eadem', 'illa', 'atomorum', 'in',
-              'quo', 'etiam', 'Democritus', 'haeret', 'turbulenta', 'concursio', 'hunc', 'mundi', 'ornatum', 'efficere',
-              'non', 'poterit', 'ne', 'illud', 'quidem', 'physici', 'credere', 'aliquid', 'esse', 'minimum', 'quod',
-              'profecto', 'numquam', 'putavisset', 'si', 'a', 'Polyaeno', 'familiari', 'suo', 'geometrica', 'discere',
-              'maluisset', 'quam', 'illum', 'etiam', 'ipsum', 'dedocere', 'Sol', 'Democrito', 'magnus', 'videtur',
-              'quippe', 'homini', 'erudito', 'in', 'geometriaque', 'perfecto', 'huic', 'pedalis', 'fortasse', 'tantum',
-              'enim', 'esse', 'censet', 'quantus', 'videtur', 'vel', 'paulo', 'aut', 'maiorem', 'aut', 'minorem', 'Ita',
-              'quae', 'mutat', 'ea', 'corrumpit', 'quae', 'sequitur', 'sunt', 'tota', 'Democriti', 'atomi', 'inane',
-              'imagines', 'quae', 'eidola', 'nominant', 'quorum', 'incursione', 'non', 'solum', 'videamus', 'sed',
-              'etiam', 'cogitemus', 'infinitio', 'ipsa', 'quam', 'apeirian', 'vocant', 'tota', 'ab', 'illo', 'est',
-              'tum', 'innumerabiles', 'mundi', 'qui', 'et', 'oriantur', 'et', 'intereant', 'cotidie', 'Quae', 'etsi',
-              'mihi', 'nullo', 'modo', 'probantur', 'tamen', 'Democritum', 'laudatum', 'a', 'ceteris', 'ab', 'hoc',
-              'qui', 'eum', 'unum', 'secutus', 'esset', 'nollem', 'vituperatum']
-
-
-true_distinct = len(set(U))
-
-
-fm_1 = FM_1()                 # single hash function
-
-fm_st = FM_st(1, 10000)       # median-of-means
-
-fm_st_median = FM_st(100, 10000)  # mean-of-medians
-
-
-sample = random.sample(len(U), 10)     # Random checkpoints in the stream
-exact_distinct = [len(set(U[:i])) for i in sample]   # Exact number of distinct elements up to index i
-
-k = 0
-for i in range(len(U)):
-    fm_1.insert(U[i])
-    fm_st.insert(U[i])
-    fm_st_median.insert(U[i])
-
-    if i in sample:
-        print(f"After {i} elements of the stream:")
-
-        acc_fm1 = (1 - abs(fm_1.query() - exact_distinct[k]) / exact_distinct[k]) * 100
-        acc_fmst = (1 - abs(fm_st.query_median_of_means() - exact_distinct[k]) / exact_distinct[k]) * 100
-        acc_fmst_med = (1 - abs(fm_st_median.query_mean_of_medians() - exact_distinct[k]) / exact_distinct[k]) * 100
-
-        print(f"Accuracy FM_1: {acc_fm1:.2f}%")
-        print(f"Accuracy FM_st (median of means): {acc_fmst:.2f}%")
-        print(f"Accuracy FM_st (mean of medians): {acc_fmst_med:.2f}%")
-        k += 1
-
-
-# Final estimates
-est_fm1 = fm_1.query()
-est_fmst = fm_st.query_median_of_means()
-est_fmst_med = fm_st_median.query_mean_of_medians()
-
-print("-" * 30)
-print(f"True number of distinct elements: {true_distinct}")
-print(f"FM_1 estimate: {est_fm1}")
-print(f"FM_st estimate: {est_fmst}")
-print(f"FM_st (mean of medians) estimate: {est_fmst_med}")
-
-
-
-
-"""
-Hash (57):   ... 0 0 1 1 1 0 0 1   (original 128-bit sequence: too long)
-Mask (15):   ... 0 0 0 0 1 1 1 1   (64-bit mask defining the observation window)
----------------------------------
-AND (&):     ... 0 0 0 0 1 0 0 1   (hashed value effectively used to count trailing zeros)
-"""
+########################################################
+#
+# Implementation of the Flajolet–Martin probabilistic counter in its general form.
+#
+# Let U be the reference stream of elements. At each time step, we want to estimate how many distinct
+# elements have appeared in the stream so far.
+#
+# The Flajolet–Martin algorithm provides a good approximation of this value without maintaining the full set of distinct
+# elements (which could be too large to store in memory).
+#
+# Assumption:
+# - the stream contains at most 2^64 distinct elements
+#
+# Input:
+# s, t: number of hash functions used to improve the approximation
+#
+# Output:
+# an approximation of the number of distinct elements seen so far in the stream, with high probability
+#
+# For better accuracy and lower variance, improved versions of Flajolet–Martin can be used;
+# a HyperLogLog sketch (HLL class) is implemented below alongside the classic estimators.
+#
+########################################################
+
+
+import math
+import mmh3
+import numpy as np
+import random
+from llvmlite import ir
+from numba import njit, prange, types
+from numba.extending import intrinsic
+
+
+
+# JIT-compiled kernels for the trailing-zero counting, so the bit fiddling runs
+# as native code instead of CPython bignum operations.
+
+@intrinsic
+def _cttz64(typingctx, val):
+    # Lower to the llvm.cttz.i64 intrinsic: a single TZCNT/BSF instruction.
+    # With the poison flag cleared, cttz(0) is defined and returns 64.
+    sig = types.int64(types.uint64)
+
+    def codegen(context, builder, signature, args):
+        return builder.cttz(args[0], ir.Constant(ir.IntType(1), 0))
+
+    return sig, codegen
+
+
+@njit(cache=True, nogil=True)
+def _trailing_zeros64(val):
+    return _cttz64(val)
+
+
+@intrinsic
+def _ctlz64(typingctx, val):
+    # Leading-zero twin of _cttz64, lowering to llvm.ctlz.i64 (LZCNT/BSR).
+    sig = types.int64(types.uint64)
+
+    def codegen(context, builder, signature, args):
+        return builder.ctlz(args[0], ir.Constant(ir.IntType(1), 0))
+
+    return sig, codegen
+
+
+@njit(cache=True, nogil=True)
+def _hll_rank(val, p):
+    # Rank of the first 1-bit among the 64-p hash bits left after removing
+    # the p bucket bits (1-based, capped at 64-p+1 when they are all zero).
+    w = val << np.uint64(p)
+    if w == np.uint64(0):
+        return 64 - p + 1
+    return _ctlz64(w) + 1
+
+
+@njit(cache=True, parallel=True, nogil=True)
+def _fm_row_update(R_TABLE, hashes, s, t):
+    # One hash lane per row: the top 16 bits pick the column (stochastic
+    # averaging — each element lands in a single register per row) and the
+    # trailing zeros of the low 48 bits update it. R_TABLE is the flat s*t
+    # register array with cell (i, j) at index i*s + j.
+    # The t rows are partitioned across threads; every thread writes only its
+    # own disjoint slice of R_TABLE, so no locking is needed.
+    for i in prange(t):
+        val = hashes[i]
+        j = np.int64(val >> np.uint64(48)) % s
+        zeros = _trailing_zeros64(val & np.uint64(0xFFFFFFFFFFFF))
+        if zeros > 48:    # all 48 observed bits were zero
+            zeros = 48
+        if zeros > R_TABLE[i * s + j]:
+            R_TABLE[i * s + j] = zeros
+
+
+def _as_bytes(element):
+    # elements are expected to be strings; anything else is coerced here, once
+    # per call, never inside a hash loop
+    if isinstance(element, str):
+        return element.encode('utf-8')
+    if isinstance(element, bytes):
+        return element
+    return str(element).encode('utf-8')
+
+
+# Allocate a zeroed uint8 array whose data pointer sits on a cache-line
+# boundary, so the register array never straddles lines unnecessarily.
+def _aligned_zeros_u8(size, alignment=64):
+    buf = np.zeros(size + alignment, dtype=np.uint8)
+    offset = (-buf.ctypes.data) % alignment
+    return buf[offset:offset + size]
+
+
+@njit(cache=True, nogil=True)
+def _fm_row_update_batch(R_TABLE, hashes, s, t):
+    # hashes is an (N, t) matrix: one row of precomputed hash lanes per element
+    for r in range(hashes.shape[0]):
+        _fm_row_update(R_TABLE, hashes[r], s, t)
+
+
+@njit(cache=True, nogil=True)
+def _fm1_max_zeros(hashes):
+    best = 0
+    for i in range(hashes.shape[0]):
+        zeros = _trailing_zeros64(hashes[i])
+        if zeros > best:
+            best = zeros
+    return best
+
+
+
+class FM_1:
+    """
+    Basic Flajolet-Martin sketch using a single hash function.
+    """
+
+    def __init__(self):
+        self.R = 0                  # maximum number of trailing zeros observed
+
+    def insert(self, element):
+        b = _as_bytes(element)   # encode once, mmh3 would re-encode on every call
+        d = mmh3.mmh3_x64_128_digest(b)
+        val = int.from_bytes(d[:8], 'little')   # low 64-bit lane of the 128-bit hash
+
+        zeros = _trailing_zeros64(np.uint64(val))   # count trailing zeros
+
+        self.R = max(self.R, zeros)
+
+    # Insert a whole stream at once: the hashes are precomputed into one
+    # array, then the trailing-zero scan runs in a single JIT call.
+    def insert_batch(self, elements):
+        hashes = np.empty(len(elements), dtype=np.uint64)
+        for i, element in enumerate(elements):
+            b = _as_bytes(element)
+            d = mmh3.mmh3_x64_128_digest(b)
+            hashes[i] = int.from_bytes(d[:8], 'little')
+        self.R = max(self.R, _fm1_max_zeros(hashes))
+
+    def query(self):
+        # the FM estimate: a power of 2, unbiased after applying the correction factor
+        return math.floor((2**self.R)/0.77351)
+
+
+class FM_st:
+    """
+    Flajolet-Martin sketch with multiple hash functions and statistical aggregation.
+    """
+
+    def __init__(self, s, t):
+        self.s = s
+        self.t = t
+
+        # The table holds t independent rows of s registers each. Every element
+        # updates one register per row (the hash picks the column), so each
+        # register observes roughly a 1/s fraction of the stream — stochastic
+        # averaging, as in the LogLog family.
+        #
+        # Aggregation strategy:
+        # - estimate the cardinality from each row
+        # - take the median of the row estimates (median-of-means)
+        #
+        # Alternative:
+        # - summarize each row by its median register
+        # - take the mean of the row estimates (mean-of-medians)
+
+        # Flat uint8 register array (the stored values never exceed 64): 8x less
+        # memory traffic than the previous (t, s) int64 matrix, and cache-line
+        # aligned. Cell (i, j) lives at index i*s + j; queries reshape a view.
+        self.R_TABLE = _aligned_zeros_u8(self.t * self.s)
+
+    def insert(self, element):
+
+        # One hash per row instead of one per (i, j) cell: the hash itself
+        # selects the column to update. Each 128-bit digest still feeds two
+        # rows through its two 64-bit lanes, so an insert costs ceil(t/2)
+        # mmh3 calls instead of s*t.
+        b = _as_bytes(element)   # encode once, mmh3 would re-encode on every call
+        pairs = (self.t + 1) // 2
+        hashes = np.empty(2 * pairs, dtype=np.uint64)
+        for seed in range(pairs):   # a unique hash function per row
+            d = mmh3.mmh3_x64_128_digest(b, seed)
+            hashes[2 * seed] = int.from_bytes(d[:8], 'little')      # low 64-bit lane
+            hashes[2 * seed + 1] = int.from_bytes(d[8:], 'little')  # high 64-bit lane
+
+        _fm_row_update(self.R_TABLE, hashes, self.s, self.t)
+
+    # Insert a whole stream at once: all hash lanes are precomputed into one
+    # dense (N, t) matrix, then a single JIT call sweeps the table.
+    def insert_batch(self, elements):
+        pairs = (self.t + 1) // 2
+        hashes = np.empty((len(elements), 2 * pairs), dtype=np.uint64)
+        for r, element in enumerate(elements):
+            b = _as_bytes(element)
+            row = hashes[r]
+            for seed in range(pairs):
+                d = mmh3.mmh3_x64_128_digest(b, seed)
+                row[2 * seed] = int.from_bytes(d[:8], 'little')
+                row[2 * seed + 1] = int.from_bytes(d[8:], 'little')
+        _fm_row_update_batch(self.R_TABLE, hashes, self.s, self.t)
+
+
+    def query_median_of_means(self):
+
+        # A row with mean register value A estimates the cardinality as
+        # s * 2^A * 0.77351: each register saw ~n/s distinct elements and
+        # E[R] ~ log2(1.29281 * n), with 0.77351 = 1/1.29281 [FM85].
+        A = np.mean(self.R_TABLE.reshape(self.t, self.s), axis=1)
+        return math.floor(np.median(self.s * (2.0 ** A) * 0.77351))
+
+    def query_mean_of_medians(self):
+
+        A = np.median(self.R_TABLE.reshape(self.t, self.s), axis=1)
+        return math.floor(np.mean(self.s * (2.0 ** A) * 0.77351))
+
+
+class HLL:
+    """
+    HyperLogLog sketch: one hash per element and m = 2^p registers, reaching
+    a relative error of about 1.04/sqrt(m) via stochastic averaging — the
+    same accuracy FM_st buys with s*t hash functions per element.
+    """
+
+    def __init__(self, p):
+        self.p = p
+        self.m = 1 << p                  # number of registers
+        self.reg = np.zeros(self.m, dtype=np.uint8)
+
+        # bias-correction constant alpha_m from the HyperLogLog paper
+        if self.m == 16:
+            self.alpha = 0.673
+        elif self.m == 32:
+            self.alpha = 0.697
+        elif self.m == 64:
+            self.alpha = 0.709
+        else:
+            self.alpha = 0.7213 / (1 + 1.079 / self.m)
+
+    def insert(self, element):
+        b = _as_bytes(element)
+        d = mmh3.mmh3_x64_128_digest(b)
+        val = int.from_bytes(d[:8], 'little')   # low 64-bit lane of the 128-bit hash
+
+        bucket = val >> (64 - self.p)           # top p bits select the register
+        rank = _hll_rank(np.uint64(val), self.p)
+        if rank > self.reg[bucket]:
+            self.reg[bucket] = rank
+
+    def query(self):
+        # harmonic mean of the per-register estimates 2^reg
+        raw = self.alpha * self.m * self.m / np.sum(np.ldexp(1.0, -self.reg.astype(np.int64)))
+
+        # small-range correction: fall back to linear counting while many
+        # registers are still empty
+        if raw <= 2.5 * self.m:
+            empty = np.count_nonzero(self.reg == 0)
+            if empty > 0:
+                raw = self.m * math.log(self.m / empty)
+
+        return math.floor(raw)
+
+
+# Stream in input (lorem ipsum...)
+
+U = ['ferri', 'deorsum', 'suo', 'pondere', 'ad', 'lineam', 'hunc', 'naturalem', 'esse', 'omnium',
+              'corporum', 'motum', 'Deinde', 'ibidem', 'homo', 'acutus', 'cum', 'illud', 'ocurreret', 'si',
+              'omnia', 'deorsus', 'e', 'regione', 'ferrentur', 'et', 'ut', 'dixi', 'ad', 'lineam', 'numquam',
+              'fore', 'ut', 'atomus', 'altera', 'alteram', 'posset', 'attingere', 'itaque', 'attulit', 'rem',
+              'commenticiam', 'declinare', 'dixit', 'atomum', 'perpaulum', 'quo', 'nihil', 'posset', 'fieri',
+              'minus', 'ita', 'effici', 'complexiones', 'et', 'copulationes', 'et', 'adhaesiones', 'atomorum',
+              'inter', 'se', 'ex', 'quo', 'efficeretur', 'mundus', 'omnesque', 'partes', 'mundi', 'quaeque',
+              'in', 'eo', 'essent', 'Quae', 'cum', 'tota', 'res', 'est', 'ficta', 'pueriliter', 'tum', 'ne',
+              'efficit', 'quidem', 'quod', 'vult', 'nam', 'et', 'ipsa', 'declinatio', 'ad', 'libidinem', 'fingitur',
+              'ait', 'enim', 'declinare', 'atomum', 'sine', 'causa', 'quo', 'nihil', 'turpius', 'physico', 'quam',
+              'fieri', 'quicquam', 'sine', 'causa', 'dicere', 'et', 'illum', 'motum', 'naturalem', 'omnium',
+              'ponderum', 'ut', 'ipse', 'constituit', 'e', 'regione', 'inferiorem', 'locum', 'petentium', 'sine',
+              'causa', 'eripuit', 'atomis', 'nec', 'tamen', 'id', 'cuius', 'causa', 'haec', 'finxerat', 'assecutus',
+              'est', 'Nam', 'si', 'omnes', 'atomi', 'declinabunt', 'nullae', 'umquam', 'cohaerescent', 'sive', 'aliae',
+              'declinabunt', 'aliae', 'suo', 'nutu', 'recte', 'ferentur', 'primum', 'erit', 'hoc', 'quasi', 'provincias',
+              'atomis', 'dare', 'quae', 'recte', 'quae', 'oblique', 'ferantur', 'deinde', 'eadem', 'illa', 'atomorum', 'in',
+              'quo', 'etiam', 'Democritus', 'haeret', 'turbulenta', 'concursio', 'hunc', 'mundi', 'ornatum', 'efficere',
+              'non', 'poterit', 'ne', 'illud', 'quidem', 'physici', 'credere', 'aliquid', 'esse', 'minimum', 'quod',
+              'profecto', 'numquam', 'putavisset', 'si', 'a', 'Polyaeno', 'familiari', 'suo', 'geometrica', 'discere',
+              'maluisset', 'quam', 'illum', 'etiam', 'ipsum', 'dedocere', 'Sol', 'Democrito', 'magnus', 'videtur',
+              'quippe', 'homini', 'erudito', 'in', 'geometriaque', 'perfecto', 'huic', 'pedalis', 'fortasse', 'tantum',
+              'enim', 'esse', 'censet', 'quantus', 'videtur', 'vel', 'paulo', 'aut', 'maiorem', 'aut', 'minorem', 'Ita',
+              'quae', 'mutat', 'ea', 'corrumpit', 'quae', 'sequitur', 'sunt', 'tota', 'Democriti', 'atomi', 'inane',
+              'imagines', 'quae', 'eidola', 'nominant', 'quorum', 'incursione', 'non', 'solum', 'videamus', 'sed',
+              'etiam', 'cogitemus', 'infinitio', 'ipsa', 'quam', 'apeirian', 'vocant', 'tota', 'ab', 'illo', 'est',
+              'tum', 'innumerabiles', 'mundi', 'qui', 'et', 'oriantur', 'et', 'intereant', 'cotidie', 'Quae', 'etsi',
+              'mihi', 'nullo', 'modo', 'probantur', 'tamen', 'Democritum', 'laudatum', 'a', 'ceteris', 'ab', 'hoc',
+              'qui', 'eum', 'unum', 'secutus', 'esset', 'nollem', 'vituperatum']
+
+
+true_distinct = len(set(U))
+
+
+fm_1 = FM_1()                 # single hash function
+
+fm_st = FM_st(1, 10000)       # median-of-means
+
+fm_st_median = FM_st(100, 10000)  # mean-of-medians
+
+hll = HLL(6)                  # HyperLogLog with 64 registers, one hash per element
+
+
+sample = sorted(random.sample(range(len(U)), 10))     # Random checkpoints in the stream
+
+# Exact number of distinct elements at each checkpoint, computed in a single
+# streaming pass with one incrementally-updated set instead of rescanning a
+# growing prefix per checkpoint.
+exact_distinct = {}
+seen = set()
+ptr = 0
+for i, x in enumerate(U):
+    seen.add(x)
+    if ptr < len(sample) and i == sample[ptr]:
+        exact_distinct[i] = len(seen)
+        ptr += 1
+
+# Bind the insert methods once: the loop body then skips four attribute
+# lookups per element.
+fm_1_insert = fm_1.insert
+fm_st_insert = fm_st.insert
+fm_st_median_insert = fm_st_median.insert
+hll_insert = hll.insert
+
+for i, x in enumerate(U):
+    fm_1_insert(x)
+    fm_st_insert(x)
+    fm_st_median_insert(x)
+    hll_insert(x)
+
+    if i in exact_distinct:
+        print(f"After {i + 1} elements of the stream:")
+
+        exact = exact_distinct[i]
+        acc_fm1 = (1 - abs(fm_1.query() - exact) / exact) * 100
+        acc_fmst = (1 - abs(fm_st.query_median_of_means() - exact) / exact) * 100
+        acc_fmst_med = (1 - abs(fm_st_median.query_mean_of_medians() - exact) / exact) * 100
+
+        print(f"Accuracy FM_1: {acc_fm1:.2f}%")
+        print(f"Accuracy FM_st (median of means): {acc_fmst:.2f}%")
+        print(f"Accuracy FM_st (mean of medians): {acc_fmst_med:.2f}%")
+
+
+# Final estimates
+est_fm1 = fm_1.query()
+est_fmst = fm_st.query_median_of_means()
+est_fmst_med = fm_st_median.query_mean_of_medians()
+est_hll = hll.query()
+
+print("-" * 30)
+print(f"True number of distinct elements: {true_distinct}")
+print(f"FM_1 estimate: {est_fm1}")
+print(f"FM_st estimate: {est_fmst}")
+print(f"FM_st (mean of medians) estimate: {est_fmst_med}")
+print(f"HLL estimate: {est_hll}")
+
+
+
+
+"""
+Hash (57):   ... 0 0 1 1 1 0 0 1   (original 128-bit sequence: too long)
+Mask (15):   ... 0 0 0 0 1 1 1 1   (64-bit mask defining the observation window)
+---------------------------------
+AND (&):     ... 0 0 0 0 1 0 0 1   (hashed value effectively used to count trailing zeros)
+"""